@@ -1,5 +1,6 @@
 import socket
-import json
+import struct
+import orjson
 import time
 import matplotlib.pyplot as plt
 import pandas as pd
@@ -13,14 +14,30 @@ class AnalystClient:
         self._port = port
         print("✅ Client initialized.")
 
+    @staticmethod
+    def _recv_exact(sock, n):
+        """Reads exactly n bytes from the socket into a preallocated buffer."""
+        buf = bytearray(n)
+        view = memoryview(buf)
+        received = 0
+        while received < n:
+            read = sock.recv_into(view[received:])
+            if read == 0:
+                raise ConnectionError("Connection closed before full message was received.")
+            received += read
+        return bytes(buf)
+
     def _send_query(self, query_dict):
         """Sends a query to the server and returns the response."""
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.connect((self._host, self._port))
-                s.sendall(json.dumps(query_dict).encode('utf-8'))
-                response_chunks = [chunk for chunk in iter(lambda: s.recv(4096), b'')]
-                response = json.loads(b''.join(response_chunks).decode('utf-8'))
+                # Messages are framed as a 4-byte big-endian length followed by
+                # the JSON payload, matching the server's framing.
+                payload = orjson.dumps(query_dict)
+                s.sendall(struct.pack('>I', len(payload)) + payload)
+                (length,) = struct.unpack('>I', self._recv_exact(s, 4))
+                response = orjson.loads(self._recv_exact(s, length))
                 return response.get("result")
         except ConnectionRefusedError:
             print("❌ Connection Error: Could not connect to the server. Is it running?")
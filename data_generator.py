@@ -1,5 +1,6 @@
 import requests
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
 class DataGenerator:
     """
@@ -8,12 +9,14 @@ class DataGenerator:
     """
     def __init__(self, base_url='http://127.0.0.1:5000'):
         self._base_url = base_url
+        # One Session so all queries reuse the same keep-alive connection
+        self._session = requests.Session()
         print(f"✅ Data Generator initialized. Server URL: {self._base_url}")
 
     def _send_query(self, query_payload):
         """Sends a POST request to the server's API."""
         try:
-            response = requests.post(f"{self._base_url}/api/query", json=query_payload)
+            response = self._session.post(f"{self._base_url}/api/query", json=query_payload)
             response.raise_for_status()
             return response.json().get("result")
         except requests.exceptions.RequestException as e:
@@ -24,40 +27,51 @@ class DataGenerator:
         """Queries all data types and saves them to CSV files."""
         print("\n--- Generating data files for Power BI ---")
 
-        # --- 1. Get Revenue Data ---
-        print("Querying revenue by region...")
-        actual_revenue = self._send_query({"type": "revenue_by_region", "use_dp": False})
-        private_revenue = self._send_query({"type": "revenue_by_region", "use_dp": True})
-
-        # --- 2. Get Count Data ---
-        print("Querying count by category...")
-        actual_counts = self._send_query({"type": "count_by_category", "use_dp": False})
-        private_counts = self._send_query({"type": "count_by_category", "use_dp": True})
+        # --- 1. Get Revenue and Count Data ---
+        # The four queries are independent, so issue them concurrently
+        print("Querying revenue by region and count by category...")
+        payloads = [
+            {"type": "revenue_by_region", "use_dp": False},
+            {"type": "revenue_by_region", "use_dp": True},
+            {"type": "count_by_category", "use_dp": False},
+            {"type": "count_by_category", "use_dp": True},
+        ]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            actual_revenue, private_revenue, actual_counts, private_counts = pool.map(self._send_query, payloads)
 
         if not all([actual_revenue, private_revenue, actual_counts, private_counts]):
             print("❌ Failed to retrieve data from server. Aborting.")
             return
 
         # --- 3. Format Data into DataFrames ---
+        # pd.Series consumes the dict iterator directly, skipping the
+        # list(d.items()) round-trip through Python tuples.
         # Actual Data
-        df_actual_rev = pd.DataFrame(list(actual_revenue.items()), columns=['Category', 'Revenue'])
+        df_actual_rev = pd.Series(actual_revenue, name='Revenue').rename_axis('Category').reset_index()
         df_actual_rev['AnalysisType'] = 'Revenue by Region'
-        
-        df_actual_count = pd.DataFrame(list(actual_counts.items()), columns=['Category', 'Count'])
+
+        df_actual_count = pd.Series(actual_counts, name='Count').rename_axis('Category').reset_index()
         df_actual_count['AnalysisType'] = 'Count by Category'
 
         # Private Data
-        df_private_rev = pd.DataFrame(list(private_revenue.items()), columns=['Category', 'Revenue'])
+        df_private_rev = pd.Series(private_revenue, name='Revenue').rename_axis('Category').reset_index()
         df_private_rev['AnalysisType'] = 'Revenue by Region'
 
-        df_private_count = pd.DataFrame(list(private_counts.items()), columns=['Category', 'Count'])
+        df_private_count = pd.Series(private_counts, name='Count').rename_axis('Category').reset_index()
         df_private_count['AnalysisType'] = 'Count by Category'
 
         # --- 4. Save to CSV ---
-        df_actual_rev.to_csv('actual_revenue.csv', index=False)
-        df_private_rev.to_csv('private_revenue.csv', index=False)
-        df_actual_count.to_csv('actual_counts.csv', index=False)
-        df_private_count.to_csv('private_counts.csv', index=False)
+        # Dispatch the four writes to a pool so the disk I/O overlaps
+        outputs = [
+            (df_actual_rev, 'actual_revenue.csv'),
+            (df_private_rev, 'private_revenue.csv'),
+            (df_actual_count, 'actual_counts.csv'),
+            (df_private_count, 'private_counts.csv'),
+        ]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(df.to_csv, path, index=False) for df, path in outputs]
+            for future in futures:
+                future.result()
 
         print("\n✅ Successfully created four CSV files:")
         print("   - actual_revenue.csv")
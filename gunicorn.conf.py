@@ -0,0 +1,15 @@
+"""Gunicorn config for serving the Flask app.
+
+preload_app makes the master process build the PrivacyEngine (and load
+the dataset) once before forking, so every worker shares the read-only
+DataFrame pages copy-on-write instead of loading its own copy. Memory
+stays roughly flat as workers are added.
+
+Run with:
+    gunicorn -c gunicorn.conf.py wsgi:application
+"""
+import multiprocessing
+
+bind = "0.0.0.0:5000"
+workers = multiprocessing.cpu_count()
+preload_app = True
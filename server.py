@@ -1,7 +1,27 @@
+import logging
+import logging.handlers
+import queue
 import socket
+import struct
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from pydp.algorithms.laplacian import BoundedSum, Count
-import json
+import orjson
+
+
+def _setup_logging():
+    """Sets up queue-based logging so formatting and I/O happen off the request path."""
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    logger = logging.getLogger(__name__)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    return logger
+
+log = _setup_logging()
 
 class DataServer:
     """
@@ -10,8 +30,10 @@ class DataServer:
     """
     def __init__(self, data_path):
         """Initializes the server and loads the dataset."""
+        # One shared PCG64 generator for all Laplace draws, instead of a fresh
+        # RNG per noise call.
+        self._rng = np.random.default_rng()
         try:
-            self._raw_data = pd.read_csv(data_path)
             # Define key columns for analytics
             self._rev_col = 'cust_profile_bba_wl72k_v3.total_rev'
             self._region_col = 'cust_profile_bba_wl72k_v3.package_service'
@@ -19,26 +41,46 @@ class DataServer:
             self._act_date_col = 'cust_profile_bba_wl72k_v3.act_date'
             self._los_col = 'cust_profile_bba_wl72k_v3.los_segment'
             self._channel_col = 'cust_profile_bba_wl72k_v3.channel_new'
+            key_cols = [self._rev_col, self._region_col, self._category_col, self._act_date_col, self._los_col, self._channel_col]
+
+            # Parse only the columns we use, with the multi-threaded Arrow
+            # reader, and let it handle the datetime conversion in the same pass.
+            self._raw_data = pd.read_csv(data_path, engine='pyarrow', usecols=key_cols, parse_dates=[self._act_date_col])
 
             # Clean and prepare data
-            self._raw_data.dropna(subset=[self._rev_col, self._region_col, self._category_col, self._act_date_col, self._los_col, self._channel_col], inplace=True)
-            # Convert act_date to datetime objects for filtering
-            self._raw_data[self._act_date_col] = pd.to_datetime(self._raw_data[self._act_date_col])
+            self._raw_data.dropna(subset=key_cols, inplace=True)
+            # Categorical dtype lets groupby work on small integer codes
+            # instead of hashing Python strings.
+            for col in (self._region_col, self._category_col, self._los_col, self._channel_col):
+                self._raw_data[col] = self._raw_data[col].astype('category')
             self._lower_bound = float(self._raw_data[self._rev_col].min())
             self._upper_bound = float(self._raw_data[self._rev_col].max())
-            print("✅ Server initialized and data loaded successfully.")
+            # Laplace sensitivity of the bounded sum; constant, so computed once
+            self._sum_sensitivity = self._upper_bound - self._lower_bound
+
+            # _raw_data is immutable after init, so memoize the aggregates once;
+            # queries then only add fresh noise on top of these. The region sums
+            # come from a single bincount over the categorical codes and the
+            # pre-clipped revenue array, with no Python-level group iteration.
+            self._region_codes = self._raw_data[self._region_col].cat.codes.to_numpy()
+            self._rev_clipped = self._raw_data[self._rev_col].clip(self._lower_bound, self._upper_bound).to_numpy()
+            regions = self._raw_data[self._region_col].cat.categories
+            self._rev_sum_by_region = pd.Series(np.bincount(self._region_codes, weights=self._rev_clipped, minlength=len(regions)), index=regions)
+            self._count_by_category = self._raw_data.groupby(self._category_col).size()
+
+            # Fingerprint counts indexed by (year, month, los, channel) so the
+            # per-request 4-predicate scan becomes a single O(1) lookup.
+            years = self._raw_data[self._act_date_col].dt.year.astype('int16').to_numpy()
+            months = self._raw_data[self._act_date_col].dt.month.astype('int8').to_numpy()
+            self._fp_counts = self._raw_data.groupby([years, months, self._raw_data[self._los_col], self._raw_data[self._channel_col]]).size()
+            log.info("✅ Server initialized and data loaded successfully.")
         except Exception as e:
-            print(f"❌ Server failed to initialize: {e}")
+            log.error("❌ Server failed to initialize: %s", e)
             self._raw_data = None
 
-    def _get_private_sum(self, data, epsilon):
-        """Calculates the differentially private sum of a list of numbers."""
-        if not data: return 0
-        return BoundedSum(epsilon=epsilon, lower_bound=self._lower_bound, upper_bound=self._upper_bound, dtype='float').quick_result(data)
-
-    def _get_private_count(self, data, epsilon):
-        """Calculates the differentially private count of items in a list."""
-        return Count(epsilon=epsilon, dtype='int').quick_result(data)
+    def _laplace(self, scale, size=None):
+        """Draws Laplace noise from the server's shared generator."""
+        return self._rng.laplace(0.0, scale, size)
 
     def process_query(self, query):
         """Processes a query and returns a result, applying DP where requested."""
@@ -49,64 +91,97 @@ class DataServer:
         epsilon = query.get("epsilon", 0.5)
 
         if query_type == "revenue_by_region":
-            grouped_data = self._raw_data.groupby(self._region_col)[self._rev_col]
+            sums = self._rev_sum_by_region
             if use_dp:
-                results = {region: self._get_private_sum(revenues.tolist(), epsilon) for region, revenues in grouped_data}
+                # BoundedSum with fixed bounds == clip + sum + Laplace(scale=(upper-lower)/epsilon),
+                # so compute every region in one vectorized pass instead of one PyDP call per group.
+                noise = self._laplace(self._sum_sensitivity / epsilon, size=len(sums))
+                results = dict(zip(sums.index, sums.to_numpy() + noise))
             else:
-                results = grouped_data.sum().astype(float).to_dict()
+                results = dict(zip(sums.index, sums.to_numpy()))
             return {"result": results}
 
         elif query_type == "count_by_category":
-            grouped_data = self._raw_data.groupby(self._category_col).size()
+            grouped_data = self._count_by_category
             if use_dp:
-                results = {category: self._get_private_count([1] * count, epsilon) for category, count in grouped_data.items()}
+                # A Laplace count has sensitivity 1, so the private count is just
+                # count + Laplace(1/epsilon) — no need to materialize [1]*count lists.
+                noise = self._laplace(1.0 / epsilon, size=len(grouped_data))
+                results = dict(zip(grouped_data.index, grouped_data.to_numpy() + noise))
             else:
-                results = grouped_data.astype(int).to_dict()
+                results = dict(zip(grouped_data.index, grouped_data.to_numpy()))
             return {"result": results}
 
         elif query_type == "count_by_fingerprint":
-            # Filter data based on the attacker's criteria
+            # Look up the attacker's criteria in the precomputed table
             params = query.get("params", {})
             year = params.get("year")
             month = params.get("month")
             los = params.get("los")
             channel = params.get("channel")
-            
-            filtered_df = self._raw_data[
-                (self._raw_data[self._act_date_col].dt.year == year) &
-                (self._raw_data[self._act_date_col].dt.month == month) &
-                (self._raw_data[self._los_col] == los) &
-                (self._raw_data[self._channel_col] == channel)
-            ]
-            count = len(filtered_df)
+
+            count = int(self._fp_counts.get((year, month, los, channel), 0))
 
             if use_dp:
-                print(f"🔒 Processing private fingerprint query (ε={epsilon})...")
-                result = self._get_private_count([1] * count, epsilon)
+                log.debug("🔒 Processing private fingerprint query (ε=%s)...", epsilon)
+                result = count + self._laplace(1.0 / epsilon)
             else:
-                print("⚠️ Processing NON-private fingerprint query...")
+                log.debug("⚠️ Processing NON-private fingerprint query...")
                 result = count
             return {"result": result}
         else:
             return {"error": "Unsupported query type."}
 
-    def start(self, host='localhost', port=9999):
-        """Starts the server to listen for incoming connections."""
+    @staticmethod
+    def _recv_exact(conn, n):
+        """Reads exactly n bytes from the connection into a preallocated buffer."""
+        buf = bytearray(n)
+        view = memoryview(buf)
+        received = 0
+        while received < n:
+            read = conn.recv_into(view[received:])
+            if read == 0:
+                raise ConnectionError("Connection closed before full message was received.")
+            received += read
+        return bytes(buf)
+
+    def _handle_connection(self, conn, addr):
+        """Serves a single client connection using length-prefixed framing."""
+        with conn:
+            log.debug("🤝 Connected by %s", addr)
+            # Messages are framed as a 4-byte big-endian length followed by the
+            # JSON payload, so queries of any size arrive intact over TCP.
+            (length,) = struct.unpack('>I', self._recv_exact(conn, 4))
+            query = orjson.loads(self._recv_exact(conn, length))
+            response_data = self.process_query(query)
+            # orjson serializes the numpy floats/ints the aggregates produce
+            # directly, so no per-value float()/int() casts are needed.
+            payload = orjson.dumps(response_data, option=orjson.OPT_SERIALIZE_NUMPY)
+            conn.sendall(struct.pack('>I', len(payload)) + payload)
+            log.debug("✅ Sent response to %s", addr)
+
+    @staticmethod
+    def _log_connection_failure(future):
+        """Logs any exception a pooled connection handler raised."""
+        exc = future.exception()
+        if exc is not None:
+            log.error("❌ Connection handler failed: %s", exc)
+
+    def start(self, host='localhost', port=9999, max_workers=8):
+        """Starts the server and dispatches connections to a thread pool."""
         if self._raw_data is None: return
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.bind((host, port))
             s.listen()
-            print(f"✅ Server is listening for connections on {host}:{port}...")
-            while True:
-                conn, addr = s.accept()
-                with conn:
-                    print(f"🤝 Connected by {addr}")
-                    data = conn.recv(4096)
-                    if not data: break
-                    query = json.loads(data.decode('utf-8'))
-                    response_data = self.process_query(query)
-                    conn.sendall(json.dumps(response_data).encode('utf-8'))
-                    print(f"✅ Sent response to {addr}")
+            log.info("✅ Server is listening for connections on %s:%s...", host, port)
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                while True:
+                    conn, addr = s.accept()
+                    # The done-callback keeps handler errors (bad frames,
+                    # malformed JSON) visible instead of dying silently in
+                    # the discarded future.
+                    future = pool.submit(self._handle_connection, conn, addr)
+                    future.add_done_callback(self._log_connection_failure)
 
 if __name__ == "__main__":
     server = DataServer(data_path='BBA_Cleaned.csv')
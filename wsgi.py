@@ -0,0 +1,14 @@
+"""WSGI entrypoint so the Flask app can run under a production server.
+
+The built-in Werkzeug dev server handles one request at a time; for real
+throughput run with gunicorn instead, e.g.:
+
+    gunicorn --preload -w 4 wsgi:application -b 0.0.0.0:5000
+
+--preload loads the data once in the master so worker processes share the
+read-only DataFrame pages via copy-on-write.
+"""
+from app import app as application
+
+if __name__ == "__main__":
+    application.run(host='0.0.0.0', port=5000, debug=False)